@@ -163,7 +163,7 @@ class LiquidacionesApp {
             const decompressed = pako.inflate(chunksAll, { to: 'string' });
             
             this.showLoading('Finalizando...');
-            this.data = JSON.parse(decompressed);
+            this.data = this.expandCompactFormat(JSON.parse(decompressed));
             this.technicians = this.data.tecnicos || [];
 
 
@@ -176,6 +176,40 @@ class LiquidacionesApp {
         }
     }
 
+    expandCompactFormat(data) {
+        // Formato compacto de liquidaciones.py (--formato compacto): las tareas de
+        // cada mes vienen por columnas y los textos repetidos como índices
+        if (!data || data.formato !== 'compacto') return data;
+        if (data.version_formato !== 1) {
+            throw new Error(`Versión de formato compacto no soportada: ${data.version_formato}`);
+        }
+        
+        const campos = data.campos_tarea;
+        const diccionarios = data.diccionarios;
+        (data.tecnicos || []).forEach(tecnico => {
+            (tecnico.meses || []).forEach(mes => {
+                const columnas = mes.tareas || {};
+                const cantidad = campos.length > 0 && columnas[campos[0]] ? columnas[campos[0]].length : 0;
+                const tareas = new Array(cantidad);
+                for (let i = 0; i < cantidad; i++) {
+                    const tarea = {};
+                    for (const campo of campos) {
+                        const valor = columnas[campo][i];
+                        tarea[campo] = diccionarios[campo] ? diccionarios[campo][valor] : valor;
+                    }
+                    tareas[i] = tarea;
+                }
+                mes.tareas = tareas;
+            });
+        });
+        
+        delete data.formato;
+        delete data.version_formato;
+        delete data.campos_tarea;
+        delete data.diccionarios;
+        return data;
+    }
+
     getCachedData() {
         try {
             const cached = localStorage.getItem('liquidaciones_cache');
@@ -233,14 +267,21 @@ class LiquidacionesApp {
         try {
             console.log('📦 Cargando datos de 2025 desde JSON...');
             
-            const response = await fetch(this.json2025Path);
-            if (!response.ok) {
-                console.warn('JSON de 2025 no encontrado, usando Excel como fallback');
-                await this.preloadAllMonths();
-                return;
+            // liquidaciones.py --meses-2025 genera el .json y el .json.gz; se prefiere el comprimido
+            let jsonData = null;
+            const responseGz = await fetch(`${this.json2025Path}.gz`);
+            if (responseGz.ok) {
+                const comprimido = new Uint8Array(await responseGz.arrayBuffer());
+                jsonData = JSON.parse(pako.inflate(comprimido, { to: 'string' }));
+            } else {
+                const response = await fetch(this.json2025Path);
+                if (!response.ok) {
+                    console.warn('JSON de 2025 no encontrado, usando Excel como fallback');
+                    await this.preloadAllMonths();
+                    return;
+                }
+                jsonData = await response.json();
             }
-
-            const jsonData = await response.json();
             this.data2025 = jsonData;
 
             console.log(`✓ JSON de 2025 cargado (${Object.keys(jsonData.meses).length} meses)`);